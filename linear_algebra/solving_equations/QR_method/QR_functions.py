@@ -2,12 +2,26 @@ import os, sys
 sys.path.append(os.getcwd())
 from linear_algebra.functions import *
 from typing import List, Tuple
+import warnings
+import numpy as np
+from scipy.linalg import solve_triangular
+
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional, run the same code without JIT
+    prange = range
+
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 matrix_shape = List[List[float]]
 vector_shape = List[float]
 
 
-def solve_with_qr_decomposition(matrix: matrix_shape) -> vector_shape:
+def solve_with_qr_decomposition(matrix: matrix_shape,
+                                use_numpy: bool = True,
+                                verbose: bool = False,
+                                dtype: type = np.float64) -> np.ndarray:
     """
     Solve linear equation using QR decomposition.
 
@@ -44,23 +58,118 @@ def solve_with_qr_decomposition(matrix: matrix_shape) -> vector_shape:
 
     3. Find coefficient vector using formula: R^-1@Q.T@b
 
+    By default all steps are done with NumPy (LAPACK), which is much faster.
+    Set `use_numpy=False` to run the implementations from this module.
+
     Args:
         matrix (matrix_shape): Original extended matrix
+        use_numpy (bool): If `True`, use `np.linalg.qr` and `solve_triangular`
+        verbose (bool): If `True`, print Q and R matrices
+        dtype (type): Float type for NumPy calculations, `np.float32` is faster,
+        but less precise, see `solve_with_qr_decomposition_batched` (only with `use_numpy=True`)
 
     Returns:
-        vector_shape: Vector of unknown variables
+        np.ndarray: Vector of unknown variables (of `dtype` type with `use_numpy=True`)
     """
+    if use_numpy:
+        data = np.asarray(matrix, dtype=dtype)
+        A, b = data[:, :-1], data[:, -1]
+        Q, R = np.linalg.qr(A)
+
+        if is_ill_conditioned(R):
+            return solve_with_qr_decomposition(matrix, verbose=verbose, dtype=np.float64)
+
+        if verbose:
+            print_matrix(Q, "Q matrix:", 4)
+            print_matrix(R, "R matrix:", 4)
+
+        return solve_triangular(R, Q.T @ b, lower=False)
+
     A, b = split_by_vectors(matrix)
     Q, R = qr_decomposition(A)
 
-    print_matrix(Q, "Q matrix:", 4)
-    print_matrix(R, "R matrix:", 4)
+    if verbose:
+        print_matrix(Q, "Q matrix:", 4)
+        print_matrix(R, "R matrix:", 4)
 
     params = get_equation_params(Q, R, b)
-    return params
+    return np.asarray(params)
+
+
+def solve_with_qr_decomposition_batched(mats: np.ndarray, dtype: type = np.float64) -> np.ndarray:
+    """
+    Solve a stack of linear equations using QR decomposition.
+
+    -----
+    Info:
+    -----
+    The same as `solve_with_qr_decomposition`, but for B equations at once.
+    `np.linalg.qr` and `np.linalg.solve` work on the last 2 axes of array,
+    so all equations are solved by one call without Python loop.
+
+    --------
+    Formula:
+    --------
+    •`C = Q.T@b` for each equation k: `C[k, i] = Σ(Q[k, j, i] * b[k, j])`
+
+    •`x = R^-1@C`
+
+    -------------
+    Float32 type:
+    -------------
+    With `dtype=np.float32` the matrices take half of the memory and
+    LAPACK works faster, but only ~7 digits are precise. If R matrix is
+    ill-conditioned (`max|r_ii| / min|r_ii| > 1 / SQRT(eps)`), the result
+    would lose too many digits, so the equations are solved again with np.float64.
 
+    Args:
+        mats (np.ndarray): Stack of extended matrices. Shape: (B, n, m + 1)
+        dtype (type): Float type of calculations
 
-def qr_decomposition(A) -> Tuple[matrix_shape, matrix_shape]:
+    Returns:
+        np.ndarray: Vectors of unknown variables. Shape: (B, m)
+    """
+    data = np.asarray(mats, dtype=dtype)
+    if data.ndim != 3:
+        raise ValueError(f"Expected stack of extended matrices with shape (B, n, m + 1), got {data.shape}. "
+                         "Use solve_with_qr_decomposition for a single matrix")
+
+    A, b = data[..., :-1], data[..., -1]  # Shapes: (B, n, m), (B, n)
+    Q, R = np.linalg.qr(A)
+
+    if is_ill_conditioned(R):
+        return solve_with_qr_decomposition_batched(mats, dtype=np.float64)
+
+    C = np.einsum('bji,bj->bi', Q, b)  # Shape (B, m)
+    return np.linalg.solve(R, C[..., np.newaxis])[..., 0]
+
+
+def is_ill_conditioned(R: np.ndarray) -> bool:
+    """
+    Return True (and warn), if triangular matrix R is too ill-conditioned for its float type.
+
+    The condition number of R is estimated by its diagonal: `max|r_ii| / min|r_ii|`.
+    If it's greater than `1 / SQRT(eps)`, the solution loses too many digits.
+    Only float types with lower precision than np.float64 are checked.
+
+    Args:
+        R (np.ndarray): Triangular matrix (or stack of matrices). Shape: (..., m, m)
+
+    Returns:
+        bool: True if equation should be solved with np.float64
+    """
+    if R.dtype == np.float64:
+        return False
+
+    r_diag = np.abs(np.diagonal(R, axis1=-2, axis2=-1))
+    cond = r_diag.max(axis=-1) / r_diag.min(axis=-1)
+    if np.any(cond > 1 / np.sqrt(np.finfo(R.dtype).eps)):
+        warnings.warn(f"R matrix is ill-conditioned for {R.dtype}, using float64 instead")
+        return True
+    return False
+
+
+def qr_decomposition(A: matrix_shape, method: str = "householder") -> Tuple[np.ndarray, np.ndarray]:
     """
     Return Q and R matrices.
 
@@ -70,7 +179,9 @@ def qr_decomposition(A) -> Tuple[matrix_shape, matrix_shape]:
     QR factorization decompose original matrix into 2: 
     Orthogonal Q matrix and triangular R matrix.
 
-    Q: Orthonormalized matrix. To get Q matrix use Gram-Schmidt process.
+    Q: Orthonormalized matrix. To get Q matrix use Householder reflections
+    (see `householder_qr`) or Gram-Schmidt process (see `gram_schmidt`).
+    Classical Gram-Schmidt loses orthogonality for ill-conditioned matrices.
     R: Triangular matrix. Q.T@A
 
     Formula:
@@ -82,19 +193,84 @@ def qr_decomposition(A) -> Tuple[matrix_shape, matrix_shape]:
 
     -----
     Args:
-        A (matrix_shape): Original matrix
+        A (matrix_shape): Original matrix, represented with list of vectors (columns)
+        method (str): "householder" or "gram_schmidt"
 
     Returns:
-        matrix_shape: Q - orthonormalized matrix
-        matrix_shape: R - triangular matrix
+        np.ndarray: Q - orthonormalized matrix
+        np.ndarray: R - triangular matrix
     """
-    Q = gram_schmidt_orthonormalization(A)
+    if method == "householder":
+        # A is stored by columns, so its transposed view has the original shape
+        return householder_qr(np.asarray(A, dtype=np.float64).T)
 
-    Q = transpose(Q)  # Return Q back to original shape
-    A = transpose(A)  # Return A back to original shape
-    R = get_r_matrix(Q, A)
+    elif method == "gram_schmidt":
+        Q, R = gram_schmidt(A)
+        return Q.T, R  # Return Q back to original shape
 
-    return Q, R
+    raise ValueError(f"Unknown QR method: {method}")
+
+
+def householder_qr(A: matrix_shape) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return Q and R matrices using Householder reflections.
+
+    -----
+    Info:
+    -----
+    Householder reflection is a matrix, that reflects a vector
+    about a hyperplane, so that all items of the vector except the first become 0:
+
+    • `H = I - β * u @ u.T`,  where `β = 2 / < u, u >`
+
+    For each column k we take the part of the column on and below the diagonal (x)
+    and build the reflection, that puts zeros under the diagonal. After all columns,
+    the changed matrix A is the triangular matrix R, and the product of all reflections
+    is the orthogonal matrix Q.
+
+    H is never built explicitly, instead the rest of the matrix
+    is updated with one rank-1 update:
+
+    • `A = A - β * u @ (u.T @ A)`
+
+    --------
+    Formula:
+    --------
+    • `r = sign(x1) * || x ||`
+    • `u = x + r * e1`
+
+    where e1 is the first basis vector (1, 0, ..., 0).
+    The sign of r is the same as the sign of x1, so we never subtract
+    two close numbers while computing u.
+
+    Args:
+        A (matrix_shape): Original matrix (n x m)
+
+    Returns:
+        np.ndarray: Q - orthonormalized matrix (n x m)
+        np.ndarray: R - triangular matrix (m x m)
+    """
+    A = np.array(A, dtype=np.float64)
+    n, m = A.shape  # Rows, Columns
+    Q = np.eye(n)
+
+    # For each column...
+    for k in range(min(n - 1, m)):
+        x = A[k:, k]
+        r = np.copysign(np.linalg.norm(x), x[0])
+        if r == 0:  # Column is already zero, nothing to reflect
+            continue
+
+        u = x.copy()
+        u[0] += r
+        beta = 2 / (u @ u)
+
+        # Apply reflection to the rest of A (from the left) and to Q (from the right)
+        A[k:, k:] -= beta * np.outer(u, u @ A[k:, k:])
+        Q[:, k:] -= beta * np.outer(Q[:, k:] @ u, u)
+
+    R = np.triu(A[:m])
+    return Q[:, :m], R
 
 
 def gram_schmidt_orthonormalization(A: matrix_shape) -> matrix_shape:
@@ -132,12 +308,70 @@ def gram_schmidt_orthonormalization(A: matrix_shape) -> matrix_shape:
     1. Get orthogonal vectors "u" for each initial vector "v"
     
     2. Normalize vectors "u" by it's norm
+
+    Both steps are done in one pass in `gram_schmidt`.
+    See `orthogonalize_matrix` and `normalize_matrix` for each step separately.
     """
-    U = orthogonalize_matrix(A)
-    Q = normalize_matrix(U)
+    Q, _ = gram_schmidt(A)
     return Q
 
 
+def gram_schmidt(A: matrix_shape) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return orthonormalized matrix (Q) and triangular matrix (R) in one pass.
+
+    -----
+    Info:
+    -----
+    The same Modified Gram-Schmidt process as in `orthogonalize_matrix`,
+    but each vector is normalized right after it becomes orthogonal.
+    Previous vectors have norm = 1, so < u, u > = 1 and the projection value
+    is just a scalar product:
+
+    • `r_jk = < u_j, u_k >`
+    • `u_k = u_k - r_jk * u_j`
+    • `r_kk = || u_k ||`,  `u_k = u_k / r_kk`
+
+    These projection values and norms are the items of R matrix,
+    so we don't need to calculate `R = Q.T@A` later.
+
+    Args:
+        A (matrix_shape): Original matrix, represented with list of vectors (m x n)
+
+    Returns:
+        np.ndarray: Q - orthonormalized vectors (m x n)
+        np.ndarray: R - triangular matrix (m x m)
+    """
+    U = np.array(A, dtype=np.float64)
+    return _gs_kernel(U)
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _gs_kernel(U: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Modified Gram-Schmidt loop for `gram_schmidt`, compiled with Numba (if installed).
+
+    Vector k is normalized, then its projection is removed from all next vectors at once.
+    These next vectors don't depend on each other, so they are updated in parallel.
+    U is changed in place.
+    """
+    m = U.shape[0]  # Columns (vectors)
+    R = np.zeros((m, m))
+
+    # For each vector...
+    for k in range(m):
+        norm = np.linalg.norm(U[k])
+        U[k] /= norm
+        R[k, k] = norm
+
+        # For each next vector...
+        for j in prange(k + 1, m):
+            r = np.dot(U[k], U[j])
+            U[j] -= r * U[k]
+            R[k, j] = r
+    return U, R
+
+
 def orthogonalize_matrix(A: matrix_shape) -> matrix_shape:
     """
     Return ortogonal matrix.
@@ -146,7 +380,7 @@ def orthogonalize_matrix(A: matrix_shape) -> matrix_shape:
         A (matrix_shape): Original matrix, represented with list of lists.
 
     Returns:
-        matrix_shape: Transformed orthogonal matrix
+        np.ndarray: Transformed orthogonal matrix
 
     ---------------------------------
     Formula for orthogonal transform:
@@ -163,26 +397,35 @@ def orthogonalize_matrix(A: matrix_shape) -> matrix_shape:
     ...
 
     un = vn - proj_u1(vn) - proj_u2(vn) - ... - proj_un-1(vn)
+
+    Modified Gram-Schmidt:
+    ----------------------
+    Here each projection is calculated not from the original vector v,
+    but from the vector u, already changed by previous projections:
+
+    u3 = v3 - proj_u1(v3)
+
+    u3 = u3 - proj_u2(u3)
+
+    The result is the same in exact arithmetic, but rounding errors
+    are not accumulated, so vectors stay orthogonal.
     """
-    m, n = len(A), len(A[0])  # Columns (vectors), Rows (items)
-    U = [[] for _ in range(m)]
+    A = np.asarray(A, dtype=np.float64)
+    m = len(A)  # Columns (vectors)
 
     # First U column will be the same as the A column
-    U[0] = list(A[0])
+    U = A.copy()
 
     # For each vector...
     for current_column in range(1, m):
-        U[current_column] = list(A[current_column])
         # For each prev column to the current column...
         for prev_column in range(current_column):
-            proj = projection_value(A, U, current_column, prev_column)
-            # For each item in this column...
-            for i in range(n):
-                U[current_column][i] -= proj * U[prev_column][i]
+            proj = projection_value(U, U, current_column, prev_column)
+            U[current_column] -= proj * U[prev_column]
     return U
 
 
-def normalize_matrix(U: matrix_shape) -> matrix_shape:
+def normalize_matrix(U: matrix_shape) -> np.ndarray:
     """
     Return normalized matrix.
     
@@ -201,16 +444,9 @@ def normalize_matrix(U: matrix_shape) -> matrix_shape:
 
     en = un / ||un||
     """
-    m, n = len(U), len(U[0])  # Columns, Rows
-    Q = [[0] * n for _ in range(m)]
-
-    # For each vector...
-    for current_vector in range(m):
-        length = get_vector_norm(U[current_vector])
-        # For each item in vector...
-        for i in range(n):
-            Q[current_vector][i] = U[current_vector][i] / length
-    return Q
+    U = np.asarray(U, dtype=np.float64)
+    lengths = np.linalg.norm(U, axis=1, keepdims=True)  # Norm of each vector
+    return U / lengths
 
 
 def projection_value(A: matrix_shape, U: matrix_shape, i: int, j: int) -> float:
@@ -218,7 +454,7 @@ def projection_value(A: matrix_shape, U: matrix_shape, i: int, j: int) -> float:
     Return projection value of a certain column. (Only multiplication value)
 
     Args:
-        A (matrix_shape): Original matrix
+        A (matrix_shape): Original (or partially transformed) matrix
         U (matrix_shape): Transformed matrix
         i (int): Original vector index
         j (int): Transformed vector index (Previously transformed vectors)
@@ -235,12 +471,12 @@ def projection_value(A: matrix_shape, U: matrix_shape, i: int, j: int) -> float:
     """
     f = A[i]
     u = U[j]
-    f_u = mul(f, u)
-    u_u = mul(u, u)
+    f_u = np.dot(f, u)
+    u_u = np.dot(u, u)
     return f_u / u_u
 
 
-def get_r_matrix(Q: matrix_shape, A: matrix_shape) -> matrix_shape:
+def get_r_matrix(Q: matrix_shape, A: matrix_shape) -> np.ndarray:
     """Calculates triangular matrix R
 
     Formula: 
@@ -254,9 +490,9 @@ def get_r_matrix(Q: matrix_shape, A: matrix_shape) -> matrix_shape:
         A (matrix_shape): Original matrix (n x m)
 
     Returns:
-        matrix_shape: Matrix R (m x m)
+        np.ndarray: Matrix R (m x m)
     """
-    return matmul(transpose(Q), A)
+    return np.asarray(Q).T @ np.asarray(A)
 
 
 def get_equation_params(Q: matrix_shape, R: matrix_shape, b: vector_shape):
@@ -291,14 +527,15 @@ def get_equation_params(Q: matrix_shape, R: matrix_shape, b: vector_shape):
 
     •`x = R^-1@C`
 
+    R is triangular, so we don't need to find R^-1. Instead we solve `Rx = C`
+    by back substitution (see `back_substitution`).
+
     ------
     Steps:
     ------
     1. Find C
 
-    2. Find inverse matrix of R
-
-    3. Find vector coefficients by matrix product of inverse R and C
+    2. Find vector coefficients by back substitution of R and C
 
 
     Args:
@@ -306,20 +543,44 @@ def get_equation_params(Q: matrix_shape, R: matrix_shape, b: vector_shape):
 
         R (matrix_shape): Triangular matrix. Shape: (m, m)
         
-        b (vector_shape): Answer vector. Shape: (n, 1)
+        b (vector_shape): Answer vector. Shape: (n,)
 
     Returns:
         vector_shape: List of unknown variables
     """
-    b = transpose(list([b]))
-    C = matmul(transpose(Q), b)  # Shape (m, 1)
+    C = np.asarray(Q).T @ np.asarray(b)  # Shape (m,)
 
-    r_inverse = inverse(R)
+    RC = back_substitution(R, C)
+    return RC
 
-    print_matrix(r_inverse, "Inverse R matrix:", 4)
-    I = matmul(R, r_inverse)
-    print_matrix(I, "R@R-1 = I matrix:", 4)
 
-    RC = matmul(r_inverse, C)
-    RC = transpose(RC)[0]
-    return RC
+def back_substitution(R: matrix_shape, C: vector_shape) -> vector_shape:
+    """
+    Return solution of the equation `Rx = C`, where R is upper triangular matrix.
+
+    -----
+    Info:
+    -----
+    The last row of R has only one non-zero value, so the last variable
+    can be found right away. Then we go from bottom to top and 
+    put all known variables to the right side of the equation.
+
+    --------
+    Formula:
+    --------
+    • `x_i = (c_i - Σ(r_ij * x_j)) / r_ii`,  j = i+1...m
+
+    Args:
+        R (matrix_shape): Upper triangular matrix. Shape: (m, m)
+        C (vector_shape): Answer vector. Shape: (m,)
+
+    Returns:
+        vector_shape: List of unknown variables
+    """
+    m = len(R)
+    x: vector_shape = [0] * m
+
+    for i in range(m - 1, -1, -1):
+        known_variables = mul(R[i][i + 1:], x[i + 1:])
+        x[i] = (C[i] - known_variables) / R[i][i]
+    return x
@@ -1,7 +1,8 @@
-from typing import Tuple
+from typing import Tuple, Union
 
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.stats import norm
 
 
 def mean(vector: list, ddof: int = None) -> float:
@@ -27,14 +28,12 @@ def mean(vector: list, ddof: int = None) -> float:
     Returns:
         float: the mean value
     """
-    m = 0
+    vector = np.asarray(vector)
     if ddof is None:
         no = len(vector)
     else:
         no = ddof
-    for item in vector:
-        m += item
-    return m / no
+    return vector.sum() / no
 
 
 def var(vector: list, ddof: int = None) -> float:
@@ -54,6 +53,10 @@ def var(vector: list, ddof: int = None) -> float:
         where
             E(x): mean value of x vector
             x - E(x): difference between x and mean value
+
+    Note: the one pass formula `(Σ(x^2) - Σ(x)^2 / n) / NO` is not used here,
+    because it loses all precision, when values are large and close to each other
+    (for example 1e9 + 1, 1e9 + 2, 1e9 + 3).
     -----
     Args:
         vector (list): value vector
@@ -62,12 +65,12 @@ def var(vector: list, ddof: int = None) -> float:
     Returns:
         float: variance
     """
-    E = mean(vector, ddof=ddof)
+    vector = np.asarray(vector, dtype=np.float64)
+    n = len(vector)
+    no = n if ddof is None else ddof
 
-    var = []
-    for x in vector:
-        var.append((x - E) ** 2)
-    return mean(var, ddof)
+    deviation = vector - vector.sum() / n
+    return np.dot(deviation, deviation) / no  # Sum of squared deviations
 
 
 def std(vector: list, ddof: int = None) -> float:
@@ -114,22 +117,33 @@ def standard_error(vector: list) -> float:
     Returns:
         float: Standard error value
     """
+    vector = np.asarray(vector)
     sdev = std(vector, len(vector) - 1)
     sdist = len(vector) ** 0.5
     return sdev / sdist
 
 
-def t_value(popmean: float, samplemean: float, sd: float, no: int) -> float:
-    se = sd / no ** 0.5
-    z = (popmean - samplemean) / se
+def t_value(popmean: Union[float, np.ndarray],
+            samplemean: Union[float, np.ndarray],
+            sd: Union[float, np.ndarray],
+            no: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+    """Return t value. Arrays of the same shape are calculated for each item (group)"""
+    se = np.asarray(sd) / np.sqrt(no)
+    z = (np.asarray(popmean) - samplemean) / se
     return z
 
 
-def paired_ttest_simp(m1: float, m2: float, sd1: float, sd2: float, n1: int, n2: int) -> float:
-    se1 = sd1 ** 2 / n1
-    se2 = sd2 ** 2 / n2
+def paired_ttest_simp(m1: Union[float, np.ndarray],
+                      m2: Union[float, np.ndarray],
+                      sd1: Union[float, np.ndarray],
+                      sd2: Union[float, np.ndarray],
+                      n1: Union[int, np.ndarray],
+                      n2: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+    """Return t value for 2 samples. Arrays of the same shape are calculated for each item (group)"""
+    se1 = np.asarray(sd1) ** 2 / n1
+    se2 = np.asarray(sd2) ** 2 / n2
 
-    t = (m1 - m2) / (se1 + se2) ** 0.5
+    t = (np.asarray(m1) - m2) / np.sqrt(se1 + se2)
 
     return t
 
@@ -147,39 +161,27 @@ def percentile(v: np.ndarray, percent: float) -> float:
     -----
     - Percentile of an array = 0.5 is the median.
     - Percentile of an array = 1.0 is the CDF (Cumulative Distribution Function).
+    - If the percentile is between 2 values of sorted array, it is linearly interpolated.
     
     -----
     Args:
         v (list): Array
-        percent (float): percentage value from 0 to 1
+        percent (float): percentage value from 0 to 1 (or list of values)
 
     Returns:
         float: Percentage value
     """
-    v = np.sort(v)
-    k = (v.size - 1) * percent
-
-    f = np.floor(k)
-    c = np.ceil(k)
-
-    if f == c:
-        return v[int(f)]
-
-    d0 = v[int(f)] * (c - k)
-    d1 = v[int(c)] * (k - f)
-    return d0 + d1
+    return np.quantile(np.asarray(v), percent)
 
 
 def median(vector: list) -> float:
     """Return the median value of list"""
-    return percentile(vector, 0.5)
+    return float(np.median(np.asarray(vector)))  # Uses partial sort (np.partition)
 
 
 def get_quantile_info(vector: np.ndarray) -> Tuple[float, float, float]:
     """Returns Q25, Median and Q75 of data"""
-    q25 = percentile(vector, 0.25)
-    q50 = percentile(vector, 0.50)  # median
-    q75 = percentile(vector, 0.75)
+    q25, q50, q75 = percentile(vector, [0.25, 0.50, 0.75])  # Sort data only once
     return q25, q50, q75
 
 
@@ -211,10 +213,10 @@ def qqplot(vector: list):
     Returns:
         plt.plot: Q-Q plot
     """
-    norm_dist = np.random.standard_normal(len(vector))
+    probs = (np.arange(100) + 0.5) / 100
 
-    x = np.percentile(norm_dist, range(100))
-    y = np.percentile(vector, range(100))
+    x = norm.ppf(probs)  # Theoretical quantiles of N(0, 1), no sampling needed
+    y = np.quantile(vector, probs)
 
     plt.figure(figsize=(8, 8))
     plt.style.use("ggplot")
@@ -227,15 +229,15 @@ def qqplot(vector: list):
     plt.show()
 
 
-def flatten(v: list) -> list:
-    """Return flatten list"""
-    return [i for j in v for i in j]
+def flatten(v: list) -> np.ndarray:
+    """Return flatten array"""
+    return np.concatenate([np.asarray(i) for i in v])
 
 
-def paired_diff(a: list, b: list) -> list:
-    """Return a list with a pairwise difference of elements"""
+def paired_diff(a: list, b: list) -> np.ndarray:
+    """Return an array with a pairwise difference of elements"""
     assert len(a) == len(b)
-    return [ai - bi for ai, bi in zip(a, b)]
+    return np.asarray(a) - np.asarray(b)
 
 
 def covariance(x: list, y: list) -> float:
@@ -286,9 +288,10 @@ def covariance(x: list, y: list) -> float:
     Returns:
         float: covariance value
     """
+    x, y = np.asarray(x), np.asarray(y)
     assert len(x) == len(y)
-    X, Y = mean(x), mean(y)
-    cov = [(xi - X) * (yi - Y) for xi, yi in zip(x, y)]
+    X, Y = x.mean(), y.mean()
+    cov = (x - X) * (y - Y)
     cov_mean = mean(cov, ddof=len(x) - 1)
     return cov_mean
 
@@ -338,39 +341,41 @@ def correlation(x: list, y: list, formula: str = "1") -> float:
     Returns:
         float: correlation coefficient value
     """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
     assert len(x) == len(y)
-    X, Y = mean(x), mean(y)
+    X, Y = x.mean(), y.mean()
 
     if formula == "1":
-        xy = mean(paired_prod(x, y))
+        n = len(x)
+        xy = np.dot(x, y) / n  # E[xy]
         num = xy - X * Y
-        x_var = mean(squared(x)) - mean(x) ** 2
-        y_var = mean(squared(y)) - mean(y) ** 2
-        den = (x_var * y_var) ** 0.5
+        x_var = np.dot(x, x) / n - X * X
+        y_var = np.dot(y, y) / n - Y * Y
+        den = np.sqrt(x_var * y_var)
         return num / den
 
     elif formula == "2":
-        cov = sum([(xi - X) * (yi - Y) for xi, yi in zip(x, y)])
-        xvar = sum([(xi - X) ** 2 for xi in x])
-        yvar = sum([(yi - Y) ** 2 for yi in y])
-        sdev = (xvar * yvar) ** 0.5
+        cov = ((x - X) * (y - Y)).sum()
+        xvar = ((x - X) ** 2).sum()
+        yvar = ((y - Y) ** 2).sum()
+        sdev = np.sqrt(xvar * yvar)
         return cov / sdev
 
 
-def paired_prod(x: list, y: list) -> list:
-    """Return a list of pairwise multiplications"""
-    return [xi * yi for xi, yi in zip(x, y)]
+def paired_prod(x: list, y: list) -> np.ndarray:
+    """Return an array of pairwise multiplications"""
+    return np.asarray(x) * np.asarray(y)
 
 
-def squared(a: list) -> list:
+def squared(a: list) -> np.ndarray:
     """
-    Return the same list with squared values
+    Return the same array with squared values
     Formula: [a[i]**2 for i in a]
     """
-    return [ai ** 2 for ai in a]
+    return np.asarray(a) ** 2
 
 
-def check_for_symmetry(p, h, s, n) -> bool:
+def check_for_symmetry(p, h, s, n) -> Union[bool, np.ndarray]:
     """
     Check data for symmetry using specified values.
 
@@ -386,10 +391,33 @@ def check_for_symmetry(p, h, s, n) -> bool:
     return np.abs(p - h) <= (3 * s) / np.sqrt(n)
 
 
+def check_for_symmetry_batch(p: np.ndarray, h: np.ndarray, s: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """
+    Check many groups of data for symmetry at once.
+
+    The same as `check_for_symmetry`, but each argument is an array
+    with a value for each group. Arrays must have the same (or broadcastable) shape.
+
+    Args:
+        p: the mean values
+        h: the medians
+        s: the standard deviations
+        n: the numbers of items in arrays
+
+    Returns:
+        Boolean array: True for symmetrical groups, otherwise False
+    """
+    p, h, s, n = np.asarray(p), np.asarray(h), np.asarray(s), np.asarray(n)
+    return check_for_symmetry(p, h, s, n)
+
+
 def check_array_for_symmetry(arr: np.ndarray) -> bool:
     """Return True if data is symmetrical, otherwise False"""
-    p = np.mean(arr)  # mean value
-    h = percentile(arr, 0.5)  # median value
-    s = np.std(arr)
+    arr = np.asarray(arr, dtype=np.float64).ravel()
     n = arr.size
+
+    p = arr.sum() / n  # mean value
+    deviation = arr - p  # Centre data before squaring to keep precision
+    s = np.sqrt(np.dot(deviation, deviation) / n)
+    h = median(arr)  # median value
     return check_for_symmetry(p, h, s, n)